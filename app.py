@@ -1,11 +1,17 @@
-from flask import Flask, redirect, url_for, abort, render_template
+from flask import Flask, redirect, url_for, abort, render_template, request
 from dotenv import load_dotenv
 from flask_login import current_user, login_required
 from extensions import db, login_manager
-from models import User
+from assets import init_assets
+from profiling import init_profiling
+from search import ensure_search_index
+from schema import init_db
+from models import User, Motivation
+from export_utils import EXPORT_FORMATS, stream_export
 from blueprints.motivation import motivation_bp
 from blueprints.auth_routes import auth_bp
 from itsdangerous import URLSafeTimedSerializer
+from sqlalchemy.orm import joinedload
 import os
 from sendgrid import SendGridAPIClient
 from sendgrid.helpers.mail import Mail
@@ -66,6 +72,12 @@ def create_app():
     login_manager.init_app(app)
     login_manager.login_view = "auth.login"
 
+    # Fingerprinted assets, HTML compression and cache headers
+    init_assets(app)
+
+    # On-demand request profiling for admins
+    init_profiling(app)
+
     # Token Serializer
     s = URLSafeTimedSerializer(app.secret_key)
 
@@ -103,9 +115,37 @@ def create_app():
             abort(403)
             return redirect(url_for("motivation.home"))
 
-        users = User.query.all()
+        users = User.query.options(joinedload(User.mood_stats)).all()
         return render_template("admin.html", users=users)
 
+    # Admin export of every saved motivation
+    @app.route("/admin/export/<fmt>")
+    @login_required
+    def admin_export(fmt):
+        if not current_user.is_admin:
+            abort(403)
+        if fmt not in EXPORT_FORMATS:
+            abort(404)
+
+        query = (
+            db.session.query(Motivation.id, Motivation.user_id, Motivation.created_at, Motivation.content)
+            .order_by(Motivation.id)
+        )
+        compress = request.args.get("gzip") == "1"
+        return stream_export(query, fmt, "all_motivations", compress=compress, title="All Motivations")
+
+    # Create tables and add new columns: flask --app wsgi init-db
+    @app.cli.command("init-db")
+    def init_db_command():
+        init_db()
+        print("Database ready.")
+
+    # Create the full-text search index: flask --app wsgi init-search
+    @app.cli.command("init-search")
+    def init_search():
+        ensure_search_index()
+        print("Search index ready.")
+
     return app
 
 # User loader
@@ -117,5 +157,5 @@ def load_user(user_id):
 if __name__ == "__main__":
     app = create_app()
     with app.app_context():
-        db.create_all()
+        init_db()
     app.run(debug=True)
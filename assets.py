@@ -0,0 +1,111 @@
+import gzip
+import hashlib
+import json
+import os
+from flask import request, url_for
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MANIFEST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "dist", "manifest.json")
+
+# Fingerprinted files never change, so browsers can keep them for a year
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+# HTML is per-user, so always revalidate against the ETag
+HTML_CACHE = "private, no-cache"
+MIN_COMPRESS_SIZE = 500
+
+_manifest = None
+
+def load_manifest():
+    global _manifest
+    if _manifest is None:
+        try:
+            with open(MANIFEST_PATH) as f:
+                _manifest = json.load(f)
+        except (OSError, ValueError):
+            # No build has been run, so fall back to the raw files
+            _manifest = {}
+    return _manifest
+
+def asset_url(path):
+    """URL of the fingerprinted copy of a static file, or the file itself."""
+    entry = load_manifest().get(path)
+    return url_for("static", filename=entry["original"] if entry else path)
+
+def image_sources(path):
+    """srcset strings per format (AVIF first) for a <picture> element."""
+    entry = load_manifest().get(path)
+    if not entry:
+        return []
+
+    sources = {}
+    for variant in entry["variants"]:
+        url = url_for("static", filename=variant["path"])
+        sources.setdefault(variant["format"], []).append(f"{url} {variant['width']}w")
+
+    order = ["avif", "webp"]
+    return [
+        {"type": f"image/{fmt}", "srcset": ", ".join(sources[fmt])}
+        for fmt in sorted(sources, key=lambda f: order.index(f) if f in order else len(order))
+    ]
+
+def choose_encoding():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted.quality("br") > 0:
+        return "br"
+    if accepted.quality("gzip") > 0:
+        return "gzip"
+    return None
+
+def compress(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=5)
+    return gzip.compress(data, compresslevel=6)
+
+def optimise_html(response):
+    """Add an ETag, conditional 304 handling and compression to HTML responses."""
+    if (
+        request.method != "GET"
+        or response.status_code != 200
+        or response.direct_passthrough
+        or response.is_streamed
+        or response.mimetype != "text/html"
+        or "Content-Encoding" in response.headers
+    ):
+        return response
+
+    body = response.get_data()
+    encoding = choose_encoding() if len(body) >= MIN_COMPRESS_SIZE else None
+
+    # Each encoding is its own representation, so it gets its own tag
+    etag = hashlib.sha1(body).hexdigest()
+    if encoding:
+        etag = f"{etag}-{encoding}"
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = HTML_CACHE
+    response.vary.add("Accept-Encoding")
+    response.vary.add("Cookie")
+
+    response.make_conditional(request)
+    if response.status_code == 304 or not encoding:
+        return response
+
+    response.set_data(compress(body, encoding))
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+def cache_static(response):
+    if request.endpoint == "static" and (request.view_args or {}).get("filename", "").startswith("dist/"):
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE
+    return response
+
+def init_assets(app):
+    app.jinja_env.globals.update(asset_url=asset_url, image_sources=image_sources)
+
+    @app.after_request
+    def after_request(response):
+        response = cache_static(response)
+        return optimise_html(response)
@@ -1,11 +1,20 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, abort, jsonify
 from huggingface_hub import InferenceClient
 from requests.exceptions import ContentDecodingError
+from sqlalchemy.exc import OperationalError, ProgrammingError
 from flask_login import login_required, current_user
 from extensions import db
-from models import Motivation
+from models import Motivation, MoodStats
+from export_utils import EXPORT_FORMATS, stream_export
+from idempotency import idempotency_key, claim_request, wait_for_result, complete_request, release_request
+from motivation_pool import pick_from_pool
+from search import search_motivations
+from chat_memory import load_context, build_messages, save_exchange, clear_context
 import numpy as np
 import os
+import threading
+import time
+import uuid
 import markdown
 
 # Create a blueprint for motivation related routes
@@ -23,6 +32,47 @@ harmful_phrases = [
     "attack", "harm", "fraud", "worthless", "give up", "sexual desire"
 ]
 neg_embs = None
+# Longest the gunicorn master spends embedding the phrases before forking
+WARMUP_TIMEOUT = 15
+
+EMOTION_TO_MOOD = {
+    "joy": "joy",
+    "anger": "anger",
+    "sadness": "sadness",
+    "fear": "fear",
+    "surprise": "surprise",
+    "love": "love",
+    "neutral": "neutral",
+    "disgust": "disgust"
+}
+MOODS = sorted(set(EMOTION_TO_MOOD.values()))
+# Emotions that send input through the safe prompt
+NEGATIVE_EMOTIONS = ["anger", "fear", "sadness"]
+
+# Serve from the pre-generated pool: "off", "fallback" (provider errors only)
+# or "fast" (also for short, generic inputs)
+POOL_MODE = os.getenv("MOTIVATION_POOL_MODE", "fallback")
+GENERIC_MAX_WORDS = 4
+# After a generation failure, skip the provider for this many seconds
+PROVIDER_COOLDOWN = 60
+provider_down_until = 0.0
+
+# System prompt for the safe path: the model reframes the input itself
+SAFE_SYSTEM_PROMPT = (
+    "The user may have expressed risky, illegal, sexual or distressed thoughts. "
+    "First, silently rephrase their input in a neutral, safe way. "
+    "Then, based only on that rephrased version, provide uplifting, safe, motivational advice. "
+    "Do not repeat harmful details and do not show the rephrased text."
+)
+
+# System prompt for follow-up chat
+CHAT_SYSTEM_PROMPT = (
+    "You are MotivateM3, a motivational coach. Be supportive, concise and practical. "
+    "Ask one short follow-up question only when needed."
+)
+# Per-message limits so a single turn can't blow up later prompts
+CHAT_MAX_CHARS = 2000
+CHAT_MAX_TOKENS = 400
 
 # Helper Functions
 def detect_emotion(user_text):
@@ -35,20 +85,11 @@ def detect_emotion(user_text):
         return top_emotion['label'], top_emotion['score']
     except Exception as e:
         print("Emotion detection failed:", e)
-        return "neutral", 1.0
+        # Neutral keeps prompting working; the None score marks it as not detected
+        return "neutral", None
 
 def map_emotion_to_mood(emotion):
-    mapping = {
-    "joy": "joy",
-    "anger": "anger",
-    "sadness": "sadness",
-    "fear": "fear",
-    "surprise": "surprise",
-    "love": "love",
-    "neutral": "neutral",
-    "disgust": "disgust"
-    }
-    return mapping.get(emotion.lower(), "neutral")
+    return EMOTION_TO_MOOD.get(emotion.lower(), "neutral")
 
 # Detect harmful intent
 def get_embedding(text):
@@ -62,94 +103,126 @@ def get_embedding(text):
         print("Embedding failed:", e)
         return []
 
-# Pre-compute embeddings for negative intents  
-def cosine_similarity(vec1, vec2):
-    v1, v2 = np.array(vec1), np.array(vec2)
-    return np.dot(v1, v2) / (np.linalg.norm(v1) * np.linalg.norm(v2))
+# Pre-compute embeddings for negative intents as one unit-normalised matrix.
+# Returns None if any phrase fails or the deadline passes, so nothing
+# partial is cached and the next caller retries.
+def build_phrase_matrix(deadline=None):
+    embs = []
+    for intent in harmful_phrases:
+        if deadline is not None and time.monotonic() > deadline:
+            print("Phrase embeddings: warm-up deadline passed")
+            return None
+        emb = np.asarray(get_embedding(intent), dtype=np.float32).ravel()
+        if not emb.size:
+            return None
+        embs.append(emb)
+    matrix = np.vstack(embs)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    # Read-only so forked workers share the pages instead of copying them
+    matrix.setflags(write=False)
+    return matrix
 
 def is_harmful(user_text):
     global neg_embs
     if neg_embs is None:
-            neg_embs = [get_embedding(intent) for intent in harmful_phrases]
+        neg_embs = build_phrase_matrix()
+        if neg_embs is None:
+            return False
 
-    user_emb = get_embedding(user_text)
-    if not user_emb:
+    user_emb = np.asarray(get_embedding(user_text), dtype=np.float32).ravel()
+    if not user_emb.size:
         return False
-    scores = [cosine_similarity(user_emb, neg) for neg in neg_embs if neg]
-    return any(score > 0.65 for score in scores)
+    scores = neg_embs @ (user_emb / np.linalg.norm(user_emb))
+    return bool((scores > 0.65).any())
+
+# Shared Markdown converter, built once instead of per call
+md = markdown.Markdown(extensions=["tables", "fenced_code"])
+md_lock = threading.Lock()
+
+def render_markdown(text):
+    with md_lock:
+        return md.reset().convert(text)
+
+def warm_up(timeout=WARMUP_TIMEOUT):
+    """Build read-only state up front (used by the gunicorn preload hook).
+
+    Stops starting new embedding calls after `timeout` seconds, so boot
+    takes at most that plus one client timeout.
+    """
+    global neg_embs
+    if neg_embs is None:
+        neg_embs = build_phrase_matrix(deadline=time.monotonic() + timeout)
 
 # Create Motivational Prompt and Reframe input
-def reframe_input(feeling, goal):
-    # Detect emotion
-    emotion, _ = detect_emotion(feeling or goal)
+def reframe_input(feeling, goal, emotion=None, harmful=None):
+    # Detect emotion and harmful intent unless the caller already has them
+    if emotion is None:
+        emotion, _ = detect_emotion(feeling or goal)
     combined_text = f"{feeling}. Goal: {goal}"
+    if harmful is None:
+        harmful = is_harmful(combined_text)
 
     # Check user feeling
-    if is_harmful(combined_text) or emotion.lower() in ["anger", "fear", "sadness"]:
-        safe_reframed_prompt = (
-            "The user has expressed risky, illegal, or sexual thoughts. " \
-            "Rephrase their thoughts in a neutral, safe way, " \
-            "so that it can be used to give positive motivational advice. " \
-            f"The user input: {combined_text}."
-        )
+    if harmful or emotion.lower() in NEGATIVE_EMOTIONS:
+        # Reframe and answer in one call instead of a separate rephrasing round-trip
+        messages = [
+            {"role": "system", "content": SAFE_SYSTEM_PROMPT},
+            {"role": "user", "content": combined_text}
+        ]
 
-        try:
-            # Generate safe text from AI
-            response = client.chat_completion(
-                model="openai/gpt-oss-20b",
-                messages=[{"role": "user", "content": safe_reframed_prompt}]
-            )
-            safe_text = response['choices'][0]['message']['content'].strip()
-
-        except Exception as e:
-            print("Error in safe reframing:", e)
-            safe_text = combined_text
-                
-        # Final motivational prompt
-        reframed_prompt = (
-            f"Provide uplifting, safe, motivational advice based on this rephrased input: '{safe_text}'."
-        )
-    
     else:
         reframed_prompt = (
             f"Give a motivating message to help achieve goal: '{goal}' "
             f"while considering they feel: {feeling}."
         )
+        messages = [{"role": "user", "content": reframed_prompt}]
 
-    return reframed_prompt
+    return messages, harmful
 
-# Routes
-@motivation_bp.route("/home")
-@login_required
-def home():
-    return render_template("index.html")
+# Flatten chat messages for the text_generation fallback
+def prompt_from_messages(messages):
+    return "\n\n".join(m["content"] for m in messages)
 
-@motivation_bp.route("/generate", methods=["POST"])
-@login_required
-def generate():
-    feeling = request.form.get("feeling", "").strip()
-    goal = request.form.get("goal", "").strip()
+# Fold old chat turns into the rolling summary
+def summarize_turns(summary, turns):
+    transcript = "\n".join(f"{t['role']}: {t['content']}" for t in turns)
+    prompt = (
+        "Update this conversation summary with the new messages. "
+        "Keep the user's goals, feelings and any advice already given. "
+        "Reply with the summary only, in under 150 words.\n\n"
+        f"Current summary: {summary or 'None'}\n\nNew messages:\n{transcript}"
+    )
+    try:
+        response = client.chat_completion(
+            model="openai/gpt-oss-20b",
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=250
+        )
+        return response['choices'][0]['message']['content'].strip()
+    except Exception as e:
+        print("Error summarizing chat:", e)
+        # Keep the newest part of the transcript rather than losing it
+        return f"{summary} {transcript}".strip()[-1500:]
 
-    if not goal and not feeling:
-        return render_template("result.html", message="Please provide a goal or a feeling.")
-    
-    # Detect emotion and map to mood
-    text_to_analyze = feeling or goal
-    emotion, _ = detect_emotion(text_to_analyze)
-    detected_mood = map_emotion_to_mood(emotion)
+def provider_degraded():
+    return time.monotonic() < provider_down_until
 
-    # Use reframe input to build prompt
-    prompt = reframe_input(feeling, goal)
+def mark_provider_down():
+    global provider_down_until
+    provider_down_until = time.monotonic() + PROVIDER_COOLDOWN
 
-    # Generate from Hugging Face model
+def is_generic(feeling, goal):
+    return len(f"{feeling} {goal}".split()) <= GENERIC_MAX_WORDS
+
+# Generate from Hugging Face model, or None if every attempt fails
+def generate_message(messages):
     try:
         response = client.chat_completion(
             model="openai/gpt-oss-20b",
-            messages=[{"role": "user", "content": prompt}]
-
-        )  
+            messages=messages
+        )
         # Extract the AI message
-        raw_message = response['choices'][0]['message']['content'].strip()
+        return response['choices'][0]['message']['content'].strip()
 
     except Exception as e:
         print(f"Error with chat_completion: {e}")
@@ -157,25 +230,174 @@ def generate():
             # Fallback: use text_generation if chat_completion is not supported
             response = client.text_generation(
                 model="openai/gpt-oss-20b",
-                prompt=prompt,
+                prompt=prompt_from_messages(messages),
                 max_new_tokens=100
             )
-            raw_message = response.generated_text.strip()
+            return response.generated_text.strip()
 
         except Exception as e:
             print(f"Error with text_generation fallback: {e}")
+            mark_provider_down()
+            return None
+
+@motivation_bp.app_template_filter("markdown")
+def markdown_filter(text):
+    return render_markdown(text)
+
+# Generate (or pick from the pool), save, and return (html, mood)
+def create_motivation(key, feeling, goal):
+    text_to_analyze = feeling or goal
+    pooled = None
+    harmful = None
+
+    if POOL_MODE != "off" and provider_degraded():
+        # Provider is failing; answer from the pool instead of waiting on timeouts.
+        # Mood stays None because nothing was detected.
+        detected_mood, emotion_score = None, None
+        pooled = pick_from_pool("neutral", current_user.id)
+
+    if pooled is None:
+        # Detect emotion and map to mood
+        emotion, emotion_score = detect_emotion(text_to_analyze)
+        # Don't record a mood the classifier never produced
+        detected_mood = map_emotion_to_mood(emotion) if emotion_score is not None else None
+
+        if POOL_MODE == "fast" and is_generic(feeling, goal):
+            # Safety check first: flagged or negative input always gets the safe LLM path
+            harmful = is_harmful(f"{feeling}. Goal: {goal}")
+            if not harmful and emotion.lower() not in NEGATIVE_EMOTIONS:
+                pooled = pick_from_pool(detected_mood or "neutral", current_user.id)
+
+    if pooled is None:
+        # Use reframe input to build prompt
+        messages, harmful = reframe_input(feeling, goal, emotion=emotion, harmful=harmful)
+        raw_message = generate_message(messages)
+
+        if raw_message is None and POOL_MODE != "off":
+            pooled = pick_from_pool(detected_mood or "neutral", current_user.id)
+        if raw_message is None and pooled is None:
             raw_message = "Sorry, there was an error generating motivation."
 
-    # Render with Markdown
-    message = markdown.markdown(raw_message, extensions=["tables", "fenced_code"])
+    # Pool entries are already rendered; fresh text is rendered with Markdown
+    if pooled is not None:
+        raw_message, message = pooled.content, pooled.html
+    else:
+        message = render_markdown(raw_message)
 
-    # Save motivation to DB
-    new_motivation = Motivation(content=raw_message, user_id=current_user.id)
+    # Save motivation to DB and roll it into the user's mood stats
+    new_motivation = Motivation(
+        content=raw_message,
+        user_id=current_user.id,
+        mood=detected_mood,
+        emotion_score=emotion_score,
+        is_harmful=harmful,
+        pool_id=pooled.id if pooled is not None else None
+    )
     db.session.add(new_motivation)
+    if detected_mood is not None:
+        MoodStats.for_user(current_user.id).record(detected_mood, harmful=harmful)
+    db.session.flush()
+    complete_request(key, new_motivation)
     db.session.commit()
 
+    return message, detected_mood or "neutral"
+
+# Routes
+@motivation_bp.route("/home")
+@login_required
+def home():
+    # One token per form render, so a double-submit or refresh reuses the first result
+    return render_template("index.html", request_token=uuid.uuid4().hex)
+
+@motivation_bp.route("/generate", methods=["POST"])
+@login_required
+def generate():
+    feeling = request.form.get("feeling", "").strip()
+    goal = request.form.get("goal", "").strip()
+
+    if not goal and not feeling:
+        return render_template("result.html", message="Please provide a goal or a feeling.")
+
+    # Repeated submissions wait for and reuse the first result
+    key = idempotency_key(current_user.id, feeling, goal, request.form.get("request_token"))
+    if not claim_request(key, current_user.id):
+        existing = wait_for_result(key)
+        if existing is not None:
+            return render_template("result.html", message=render_markdown(existing.content), mood=(existing.mood or "neutral"))
+        # The first request failed or went stale; take over if we can
+        if not claim_request(key, current_user.id):
+            return render_template("result.html", message="Your motivation is still being generated. Check your history in a moment.")
+
+    try:
+        message, detected_mood = create_motivation(key, feeling, goal)
+    except Exception:
+        # Free the claim so a retry of this form isn't stuck waiting
+        db.session.rollback()
+        release_request(key)
+        raise
+
     return render_template("result.html", message=message, mood=detected_mood.lower())
 
+@motivation_bp.route("/chat", methods=["GET", "POST"])
+@login_required
+def chat():
+    context = load_context(current_user.id)
+
+    if request.method == "GET":
+        return render_template("chat.html", turns=context["turns"], summary=context["summary"])
+
+    data = request.get_json(silent=True) or request.form
+    message = (data.get("message") or "").strip()
+    if not message:
+        if request.is_json:
+            return jsonify({"error": "Message is required."}), 400
+        flash("Please type a message.", "warning")
+        return redirect(url_for("motivation.chat"))
+
+    if len(message) > CHAT_MAX_CHARS:
+        error = f"Please keep messages under {CHAT_MAX_CHARS} characters."
+        if request.is_json:
+            return jsonify({"error": error}), 400
+        flash(error, "warning")
+        return redirect(url_for("motivation.chat"))
+
+    # Same safety gate as /generate; stays on while a flagged turn is in the window
+    emotion, _ = detect_emotion(message)
+    flagged = is_harmful(message) or emotion.lower() in NEGATIVE_EMOTIONS
+    if flagged or any(t.get("flagged") for t in context["turns"]):
+        system_prompt = SAFE_SYSTEM_PROMPT
+    else:
+        system_prompt = CHAT_SYSTEM_PROMPT
+
+    messages = build_messages(context, system_prompt, message)
+    try:
+        response = client.chat_completion(
+            model="openai/gpt-oss-20b",
+            messages=messages,
+            max_tokens=CHAT_MAX_TOKENS
+        )
+        reply = response['choices'][0]['message']['content'].strip()
+    except Exception as e:
+        # Nothing is saved, so the failure never ends up in later prompts
+        print(f"Error with chat_completion: {e}")
+        error = "Sorry, I couldn't generate a response right now. Please try again."
+        if request.is_json:
+            return jsonify({"error": error}), 503
+        flash(error, "danger")
+        return redirect(url_for("motivation.chat"))
+
+    save_exchange(current_user.id, context, message, reply, summarize_turns, flagged=flagged)
+
+    if request.is_json:
+        return jsonify({"reply": reply, "reply_html": render_markdown(reply)})
+    return redirect(url_for("motivation.chat"))
+
+@motivation_bp.route("/chat/clear", methods=["POST"])
+@login_required
+def chat_clear():
+    clear_context(current_user.id)
+    return redirect(url_for("motivation.chat"))
+
 @motivation_bp.route("/history")
 @login_required
 def history():
@@ -185,14 +407,47 @@ def history():
     formatted_history = []
     for record in user_history:
         formatted_history.append({
-            "content": markdown.markdown(
-                record.content,
-                extensions=["fenced_code", "tables"]
-            ),
-            "created_at": record.created_at
+            "content": render_markdown(record.content),
+            "created_at": record.created_at,
+            "mood": record.mood
         })
         
-    return render_template("history.html", history=formatted_history, name=current_user.first_name)
+    stats = db.session.get(MoodStats, current_user.id)
+    return render_template("history.html", history=formatted_history, name=current_user.first_name, stats=stats)
+
+@motivation_bp.route("/history/search")
+@login_required
+def search():
+    q = request.args.get("q", "").strip()
+    page = max(request.args.get("page", 1, type=int), 1)
+
+    results, has_next, unavailable = [], False, False
+    if q:
+        try:
+            results, has_next = search_motivations(current_user.id, q, page=page)
+        except (ProgrammingError, OperationalError) as e:
+            # Index missing: 'flask --app wsgi init-db' hasn't run on this database
+            print("Search failed:", e)
+            db.session.rollback()
+            unavailable = True
+
+    return render_template("search.html", q=q, results=results, page=page, has_next=has_next, unavailable=unavailable)
+
+@motivation_bp.route("/history/export/<fmt>")
+@login_required
+def export_history(fmt):
+    if fmt not in EXPORT_FORMATS:
+        abort(404)
+
+    # Select plain columns so rows stream without filling the session
+    query = (
+        db.session.query(Motivation.id, Motivation.user_id, Motivation.created_at, Motivation.content)
+        .filter(Motivation.user_id == current_user.id)
+        .order_by(Motivation.created_at.desc())
+    )
+    compress = request.args.get("gzip") == "1"
+    title = f"{current_user.first_name}'s Motivation History"
+    return stream_export(query, fmt, "motivation_history", compress=compress, title=title)
 
 @motivation_bp.route("/support")
 @login_required
@@ -0,0 +1,116 @@
+"""Build optimised, fingerprinted copies of the static images.
+
+Run before deploying (e.g. as part of the Render build command):
+
+    python build_assets.py
+
+Writes resized WebP/AVIF variants plus a hashed copy of each original into
+static/dist/ and records them in static/dist/manifest.json, which the
+asset helpers in assets.py read at runtime. Needs Pillow; AVIF output is
+skipped if the installed Pillow cannot encode it.
+"""
+import hashlib
+import json
+from io import BytesIO
+import os
+import re
+import shutil
+import sys
+
+from PIL import Image
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(BASE_DIR, "static")
+DIST_DIR = os.path.join(STATIC_DIR, "dist")
+MANIFEST_PATH = os.path.join(DIST_DIR, "manifest.json")
+
+# Source folders (relative to static/) whose images get variants
+IMAGE_DIRS = ["landing"]
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+WIDTHS = [480, 960, 1440]
+FORMATS = {
+    "avif": {"quality": 50},
+    "webp": {"quality": 80, "method": 6},
+}
+
+def content_hash(data, length=10):
+    return hashlib.sha256(data).hexdigest()[:length]
+
+def slugify(name):
+    return re.sub(r"[^A-Za-z0-9_-]+", "-", name).strip("-").lower()
+
+def can_encode(fmt):
+    Image.init()
+    return fmt.upper() in Image.SAVE
+
+def write_hashed(data, rel_dir, stem, ext):
+    filename = f"{stem}.{content_hash(data)}.{ext}"
+    out_dir = os.path.join(DIST_DIR, rel_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, filename), "wb") as f:
+        f.write(data)
+    return f"dist/{rel_dir}/{filename}"
+
+def encode(image, fmt, width):
+    resized = image
+    if image.width > width:
+        height = round(image.height * width / image.width)
+        resized = image.resize((width, height), Image.LANCZOS)
+    buffer = BytesIO()
+    resized.save(buffer, format=fmt.upper(), **FORMATS[fmt])
+    return buffer.getvalue(), resized.width, resized.height
+
+def build_image(rel_path):
+    src = os.path.join(STATIC_DIR, rel_path)
+    rel_dir = os.path.dirname(rel_path)
+    stem = slugify(os.path.splitext(os.path.basename(rel_path))[0])
+    ext = os.path.splitext(rel_path)[1].lstrip(".").lower()
+
+    with open(src, "rb") as f:
+        original = f.read()
+
+    entry = {
+        "original": write_hashed(original, rel_dir, stem, ext),
+        "variants": [],
+    }
+
+    with Image.open(src) as image:
+        image.load()
+        entry["width"], entry["height"] = image.width, image.height
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA")
+
+        for fmt in FORMATS:
+            if not can_encode(fmt):
+                print(f"Skipping {fmt}: not supported by this Pillow build")
+                continue
+            # Always include one variant at the original size
+            widths = sorted({w for w in WIDTHS if w < image.width} | {image.width})
+            for width in widths:
+                data, w, h = encode(image, fmt, width)
+                path = write_hashed(data, rel_dir, f"{stem}-{w}w", fmt)
+                entry["variants"].append({"path": path, "format": fmt, "width": w, "height": h})
+
+    return entry
+
+def main():
+    if os.path.isdir(DIST_DIR):
+        shutil.rmtree(DIST_DIR)
+    os.makedirs(DIST_DIR)
+
+    manifest = {}
+    for folder in IMAGE_DIRS:
+        for name in sorted(os.listdir(os.path.join(STATIC_DIR, folder))):
+            if not name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            rel_path = f"{folder}/{name}"
+            manifest[rel_path] = build_image(rel_path)
+            print(f"Built {rel_path}: {len(manifest[rel_path]['variants'])} variants")
+
+    with open(MANIFEST_PATH, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    print(f"Wrote {MANIFEST_PATH}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""Pre-generate motivations for every mood into the motivation pool.
+
+Run on a schedule (e.g. a daily cron job) to refresh the pool:
+
+    python build_pool.py --per-mood 10
+
+New entries are pre-rendered to HTML. Each mood is then trimmed to the
+newest motivation_pool.POOL_SIZE active entries, so the pool rotates.
+"""
+import argparse
+import random
+import sys
+
+from app import create_app
+from extensions import db
+from schema import init_db
+from motivation_pool import POOL_SIZE, add_to_pool, rotate_pool
+
+# Different angles keep the pool from reading like one message repeated
+ANGLES = [
+    "focus on taking one small step today",
+    "focus on self-compassion",
+    "focus on discipline and routine",
+    "focus on progress over perfection",
+    "focus on resilience after setbacks",
+    "focus on gratitude and perspective",
+    "focus on energy, rest and recovery",
+    "focus on courage and trying anyway",
+]
+
+def generate_one(client, mood):
+    prompt = (
+        f"Write a short, high-quality motivational message (under 120 words) for someone who is feeling {mood}. "
+        f"Make it warm, practical and safe; {random.choice(ANGLES)}. "
+        "Do not mention that you are an AI and do not ask questions."
+    )
+    response = client.chat_completion(
+        model="openai/gpt-oss-20b",
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0.9
+    )
+    return response['choices'][0]['message']['content'].strip()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--per-mood", type=int, default=10, help="new motivations to generate per mood")
+    parser.add_argument("--keep", type=int, default=POOL_SIZE, help="active motivations to keep per mood")
+    parser.add_argument("--mood", action="append", help="only refresh these moods")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        init_db()
+        from blueprints.motivation import MOODS, client, render_markdown
+
+        failures = 0
+        for mood in args.mood or MOODS:
+            added = 0
+            for _ in range(args.per_mood):
+                try:
+                    content = generate_one(client, mood)
+                except Exception as e:
+                    print(f"Generation failed for {mood}: {e}")
+                    failures += 1
+                    continue
+                add_to_pool(mood, content, render_markdown(content))
+                added += 1
+
+            db.session.flush()
+            retired = rotate_pool(mood, keep=args.keep) if added else 0
+            db.session.commit()
+            print(f"{mood}: added {added}, retired {retired}")
+
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+import threading
+from collections import OrderedDict
+from sqlalchemy import func
+from extensions import db
+from models import ChatTurn, ChatSummary
+
+# Messages kept verbatim in the prompt
+RECENT_TURNS = 8
+# Extra messages allowed to pile up before folding them into the summary,
+# so we only pay for a summarisation call every few turns
+SUMMARY_BATCH = 4
+SUMMARY_MAX_CHARS = 1500
+# Users whose context is kept in process
+CACHE_SIZE = 256
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+def _turn_dict(turn):
+    return {"id": turn.id, "role": turn.role, "content": turn.content, "flagged": bool(turn.flagged)}
+
+def _last_turn_id(user_id):
+    return db.session.query(func.max(ChatTurn.id)).filter(ChatTurn.user_id == user_id).scalar()
+
+def _remember(user_id, context):
+    with _lock:
+        _cache[user_id] = context
+        _cache.move_to_end(user_id)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+
+def load_context(user_id):
+    """Summary plus recent turns for a user, served from cache when current."""
+    # One indexed lookup tells us whether another worker has added turns
+    last_id = _last_turn_id(user_id)
+    with _lock:
+        cached = _cache.get(user_id)
+    if cached is not None and cached["last_turn_id"] == last_id:
+        _remember(user_id, cached)
+        return cached
+
+    summary = db.session.get(ChatSummary, user_id)
+    turns = (
+        ChatTurn.query.filter_by(user_id=user_id)
+        .order_by(ChatTurn.id.desc())
+        .limit(RECENT_TURNS + SUMMARY_BATCH)
+        .all()
+    )
+    context = {
+        "summary": summary.summary if summary else "",
+        "turns": [_turn_dict(t) for t in reversed(turns)],
+        "last_turn_id": last_id,
+    }
+    _remember(user_id, context)
+    return context
+
+def build_messages(context, system_prompt, message):
+    """Prompt messages: system prompt, rolling summary, recent window, new message."""
+    messages = [{"role": "system", "content": system_prompt}]
+    if context["summary"]:
+        messages.append({
+            "role": "system",
+            "content": f"Summary of the earlier conversation: {context['summary']}"
+        })
+    messages.extend({"role": t["role"], "content": t["content"]} for t in context["turns"])
+    messages.append({"role": "user", "content": message})
+    return messages
+
+def save_exchange(user_id, context, message, reply, summarize, flagged=False):
+    """Store a user/assistant pair and fold old turns into the summary when the window overflows."""
+    new_turns = [
+        ChatTurn(user_id=user_id, role="user", content=message, flagged=flagged),
+        ChatTurn(user_id=user_id, role="assistant", content=reply),
+    ]
+    db.session.add_all(new_turns)
+    db.session.flush()
+
+    turns = context["turns"] + [_turn_dict(t) for t in new_turns]
+    summary = context["summary"]
+
+    if len(turns) > RECENT_TURNS + SUMMARY_BATCH:
+        overflow, turns = turns[:-RECENT_TURNS], turns[-RECENT_TURNS:]
+        summary = summarize(summary, overflow)[:SUMMARY_MAX_CHARS]
+
+        row = db.session.get(ChatSummary, user_id)
+        if row is None:
+            row = ChatSummary(user_id=user_id)
+            db.session.add(row)
+        row.summary = summary
+
+        ChatTurn.query.filter(
+            ChatTurn.user_id == user_id,
+            ChatTurn.id <= overflow[-1]["id"]
+        ).delete(synchronize_session=False)
+
+    db.session.commit()
+
+    context = {"summary": summary, "turns": turns, "last_turn_id": new_turns[-1].id}
+    _remember(user_id, context)
+    return context
+
+def clear_context(user_id):
+    ChatTurn.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+    ChatSummary.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+    db.session.commit()
+    with _lock:
+        _cache.pop(user_id, None)
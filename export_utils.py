@@ -0,0 +1,92 @@
+import csv
+import io
+import json
+import zlib
+from flask import Response, stream_with_context
+
+# Rows fetched per round-trip when streaming from the DB
+EXPORT_BATCH_SIZE = 500
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "jsonl": ("application/x-ndjson", "jsonl"),
+    "md": ("text/markdown", "md"),
+}
+
+EXPORT_FIELDS = ["id", "user_id", "created_at", "content"]
+
+def iter_rows(query, batch_size=EXPORT_BATCH_SIZE):
+    """Yield rows from a query using a server-side cursor."""
+    for row in query.yield_per(batch_size):
+        yield row
+
+def _row_dict(row):
+    created_at = row.created_at.isoformat() if row.created_at else ""
+    return {
+        "id": row.id,
+        "user_id": row.user_id,
+        "created_at": created_at,
+        "content": row.content,
+    }
+
+def render_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(_row_dict(row))
+        # Flush the buffer every row so memory stays flat
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def render_jsonl(rows):
+    for row in rows:
+        yield json.dumps(_row_dict(row), ensure_ascii=False) + "\n"
+
+def render_markdown(rows, title="Motivation History"):
+    yield f"# {title}\n\n"
+    for row in rows:
+        created_at = row.created_at.strftime("%Y-%m-%d %H:%M") if row.created_at else ""
+        yield f"## {created_at}\n\n{row.content}\n\n---\n\n"
+
+RENDERERS = {
+    "csv": render_csv,
+    "jsonl": render_jsonl,
+    "md": render_markdown,
+}
+
+def gzip_stream(chunks, level=6):
+    """Compress an iterable of str chunks into a gzip stream on the fly."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
+
+def _encode(chunks):
+    for chunk in chunks:
+        yield chunk.encode("utf-8")
+
+def stream_export(query, fmt, filename, compress=False, title=None):
+    """Build a chunked Response that streams query rows in the given format."""
+    mimetype, extension = EXPORT_FORMATS[fmt]
+    rows = iter_rows(query)
+    if fmt == "md" and title:
+        chunks = render_markdown(rows, title=title)
+    else:
+        chunks = RENDERERS[fmt](rows)
+
+    headers = {"X-Content-Type-Options": "nosniff"}
+    if compress:
+        body = gzip_stream(chunks)
+        mimetype = "application/gzip"
+        extension += ".gz"
+    else:
+        body = _encode(chunks)
+
+    headers["Content-Disposition"] = f'attachment; filename="{filename}.{extension}"'
+    return Response(stream_with_context(body), mimetype=mimetype, headers=headers)
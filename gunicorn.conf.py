@@ -0,0 +1,22 @@
+import os
+
+# Load the app once in the master and fork workers from it.
+# Set GUNICORN_PRELOAD=0 to go back to importing per worker.
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+
+def when_ready(server):
+    if not server.cfg.preload_app:
+        return
+    from wsgi import app
+    from warmup import warm_up
+
+    warm_up(app)
+    server.log.info("Preloaded shared state in master")
+
+def post_fork(server, worker):
+    if not server.cfg.preload_app:
+        return
+    from wsgi import app
+    from warmup import reset_after_fork
+
+    reset_after_fork(app)
@@ -0,0 +1,86 @@
+import hashlib
+import time
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from extensions import db
+from models import GenerationRequest
+
+# Identical submissions without a form token are merged within this window
+DEDUPE_WINDOW_SECONDS = 60
+# How long a repeat submission waits for the first one (below gunicorn's 30s timeout)
+WAIT_SECONDS = 25
+POLL_INTERVAL = 0.5
+# Unfinished claims older than this are abandoned (gunicorn kills workers after 30s)
+STALE_AFTER = timedelta(seconds=60)
+# Claims older than this are cleaned up
+CLAIM_TTL = timedelta(days=1)
+
+def idempotency_key(user_id, feeling, goal, token=None):
+    # The text is always part of the key, so a form restored with Back and
+    # edited gets a fresh result instead of the earlier one
+    text = f"{' '.join(feeling.lower().split())}:{' '.join(goal.lower().split())}"
+    if token:
+        raw = f"{user_id}:token:{token}:{text}"
+    else:
+        bucket = int(time.time() // DEDUPE_WINDOW_SECONDS)
+        raw = f"{user_id}:{text}:{bucket}"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+def claim_request(key, user_id):
+    """Return True if this request owns the key, False if another already does."""
+    GenerationRequest.query.filter(
+        GenerationRequest.user_id == user_id,
+        GenerationRequest.created_at < datetime.utcnow() - CLAIM_TTL
+    ).delete(synchronize_session=False)
+
+    if _insert_claim(key, user_id):
+        return True
+
+    # A claim with no result that outlived any generation was abandoned
+    # (e.g. the worker was killed); take it over
+    stale = GenerationRequest.query.filter(
+        GenerationRequest.key == key,
+        GenerationRequest.motivation_id.is_(None),
+        GenerationRequest.created_at < datetime.utcnow() - STALE_AFTER
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return bool(stale) and _insert_claim(key, user_id)
+
+def _insert_claim(key, user_id):
+    db.session.add(GenerationRequest(key=key, user_id=user_id))
+    try:
+        db.session.commit()
+        return True
+    except IntegrityError:
+        db.session.rollback()
+        return False
+
+def release_request(key):
+    """Drop an unfinished claim after the owning request failed."""
+    GenerationRequest.query.filter(
+        GenerationRequest.key == key,
+        GenerationRequest.motivation_id.is_(None)
+    ).delete(synchronize_session=False)
+    db.session.commit()
+
+def wait_for_result(key):
+    """Poll until the owning request saves its motivation; None if it gave up or we time out."""
+    deadline = time.monotonic() + WAIT_SECONDS
+    while True:
+        claim = db.session.get(GenerationRequest, key, populate_existing=True)
+        if claim is None:
+            # The owner failed and released its claim
+            return None
+        if claim.motivation_id is not None:
+            return claim.motivation
+        if time.monotonic() >= deadline:
+            return None
+        # End the read transaction so the next poll sees new commits
+        db.session.rollback()
+        time.sleep(POLL_INTERVAL)
+
+def complete_request(key, motivation):
+    """Attach the saved motivation to the claim (committed by the caller)."""
+    claim = db.session.get(GenerationRequest, key)
+    if claim is not None:
+        claim.motivation_id = motivation.id
@@ -1,5 +1,6 @@
 from flask_login import UserMixin
-from datetime import datetime
+from datetime import datetime, timedelta
+from sqlalchemy.dialects import postgresql, sqlite
 from extensions import db
 
 # User model for authentication
@@ -15,14 +16,156 @@ class User(UserMixin, db.Model):
     code_expires_at = db.Column(db.DateTime, nullable=True)
 
     motivations = db.relationship("Motivation", backref="user", lazy=True)
+    mood_stats = db.relationship("MoodStats", backref="user", uselist=False, lazy=True)
 
 # Saved Motivations
 class Motivation(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    mood = db.Column(db.String(20), nullable=True)
+    emotion_score = db.Column(db.Float, nullable=True)
+    is_harmful = db.Column(db.Boolean, default=False)
+    pool_id = db.Column(db.Integer, db.ForeignKey("motivation_pool.id"), nullable=True)
 
-    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False, index=True)
+
+# Pre-generated, pre-rendered motivations served without calling the LLM
+class PooledMotivation(db.Model):
+    __tablename__ = "motivation_pool"
+
+    id = db.Column(db.Integer, primary_key=True)
+    mood = db.Column(db.String(20), nullable=False, index=True)
+    content = db.Column(db.Text, nullable=False)
+    html = db.Column(db.Text, nullable=False)
+    active = db.Column(db.Boolean, default=True, nullable=False)
+    served_count = db.Column(db.Integer, default=0, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+# Claims a /generate submission so repeats reuse the first result
+class GenerationRequest(db.Model):
+    __tablename__ = "generation_requests"
+
+    key = db.Column(db.String(64), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False, index=True)
+    motivation_id = db.Column(db.Integer, db.ForeignKey("motivation.id"), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    motivation = db.relationship("Motivation")
+
+# Running per-user mood totals, updated on every saved motivation
+class MoodStats(db.Model):
+    __tablename__ = "mood_stats"
+
+    RECENT_WINDOW = 10
+
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), primary_key=True)
+    total = db.Column(db.Integer, default=0, nullable=False)
+    harmful_count = db.Column(db.Integer, default=0, nullable=False)
+    mood_counts = db.Column(db.JSON, default=dict, nullable=False)
+    recent_moods = db.Column(db.JSON, default=list, nullable=False)
+    last_mood = db.Column(db.String(20), nullable=True)
+    mood_streak = db.Column(db.Integer, default=0, nullable=False)
+    day_streak = db.Column(db.Integer, default=0, nullable=False)
+    longest_day_streak = db.Column(db.Integer, default=0, nullable=False)
+    last_active = db.Column(db.Date, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    @classmethod
+    def for_user(cls, user_id):
+        """The user's stats row, locked until commit so concurrent updates queue up."""
+        dialect = db.session.get_bind().dialect.name
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+
+        # Create the row if needed without racing another first submission
+        db.session.execute(
+            insert(cls)
+            .values(
+                user_id=user_id, total=0, harmful_count=0, mood_counts={}, recent_moods=[],
+                mood_streak=0, day_streak=0, longest_day_streak=0
+            )
+            .on_conflict_do_nothing(index_elements=["user_id"])
+        )
+        return (
+            cls.query.filter_by(user_id=user_id)
+            .with_for_update()
+            .populate_existing()
+            .one()
+        )
+
+    def record(self, mood, harmful=False, when=None):
+        """Fold one new motivation into the running totals."""
+        when = when or datetime.utcnow()
+        today = when.date()
+
+        # JSON columns are reassigned so SQLAlchemy sees the change
+        counts = dict(self.mood_counts or {})
+        counts[mood] = counts.get(mood, 0) + 1
+        self.mood_counts = counts
+        self.recent_moods = ([mood] + list(self.recent_moods or []))[:self.RECENT_WINDOW]
+
+        self.total = (self.total or 0) + 1
+        if harmful:
+            self.harmful_count = (self.harmful_count or 0) + 1
+
+        self.mood_streak = (self.mood_streak or 0) + 1 if mood == self.last_mood else 1
+        self.last_mood = mood
+
+        if self.last_active == today - timedelta(days=1):
+            self.day_streak = (self.day_streak or 0) + 1
+        elif self.last_active != today:
+            self.day_streak = 1
+        self.last_active = today
+        self.longest_day_streak = max(self.longest_day_streak or 0, self.day_streak)
+
+    @property
+    def current_day_streak(self):
+        """day_streak, or 0 once a full day has passed without a motivation."""
+        if self.last_active is None or self.last_active < datetime.utcnow().date() - timedelta(days=1):
+            return 0
+        return self.day_streak
+
+    @property
+    def top_mood(self):
+        if not self.mood_counts:
+            return None
+        return max(self.mood_counts, key=self.mood_counts.get)
+
+# Recent chat turns; older ones are folded into ChatSummary and deleted
+class ChatTurn(db.Model):
+    __tablename__ = "chat_turns"
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False, index=True)
+    role = db.Column(db.String(10), nullable=False)
+    content = db.Column(db.Text, nullable=False)
+    flagged = db.Column(db.Boolean, default=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class ChatSummary(db.Model):
+    __tablename__ = "chat_summaries"
+
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), primary_key=True)
+    summary = db.Column(db.Text, nullable=False, default="")
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+# Captured admin request profiles, trimmed to the most recent few
+class RequestProfile(db.Model):
+    __tablename__ = "request_profiles"
+
+    id = db.Column(db.Integer, primary_key=True)
+    mode = db.Column(db.String(10), nullable=False)
+    method = db.Column(db.String(10), nullable=False)
+    path = db.Column(db.String(500), nullable=False)
+    status = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    duration_ms = db.Column(db.Float, nullable=False)
+    query_count = db.Column(db.Integer, nullable=False)
+    query_ms = db.Column(db.Float, nullable=False)
+    slowest_queries = db.Column(db.JSON, nullable=False)
+    summary = db.Column(db.Text, nullable=False)
+    folded = db.Column(db.Text, nullable=True)
+    pstats = db.Column(db.LargeBinary, nullable=True)
 
 class PasswordReset(db.Model):
     __tablename__ = "password_resets"
@@ -0,0 +1,51 @@
+from sqlalchemy import select
+from extensions import db
+from models import Motivation, PooledMotivation
+
+# Active entries kept per mood; older ones are retired on refresh
+POOL_SIZE = 50
+# How many of a user's recent motivations count as "already seen"
+SEEN_WINDOW = 200
+
+def pick_from_pool(mood, user_id):
+    """Least-served active entry for a mood that this user hasn't been given yet."""
+    seen = (
+        select(Motivation.pool_id)
+        .where(Motivation.user_id == user_id, Motivation.pool_id.isnot(None))
+        .order_by(Motivation.id.desc())
+        .limit(SEEN_WINDOW)
+    )
+    base = PooledMotivation.query.filter_by(active=True).order_by(
+        PooledMotivation.served_count, PooledMotivation.id
+    )
+
+    entry = base.filter(PooledMotivation.mood == mood, PooledMotivation.id.notin_(seen)).first()
+    if entry is None and mood != "neutral":
+        entry = base.filter(PooledMotivation.mood == "neutral", PooledMotivation.id.notin_(seen)).first()
+    if entry is None:
+        # Everything has been seen; repeats beat an error message
+        entry = base.filter(PooledMotivation.mood == mood).first()
+    if entry is None:
+        return None
+
+    entry.served_count = PooledMotivation.served_count + 1
+    return entry
+
+def add_to_pool(mood, content, html):
+    entry = PooledMotivation(mood=mood, content=content, html=html)
+    db.session.add(entry)
+    return entry
+
+def rotate_pool(mood, keep=POOL_SIZE):
+    """Retire all but the newest `keep` active entries for a mood."""
+    keep_ids = (
+        select(PooledMotivation.id)
+        .where(PooledMotivation.mood == mood, PooledMotivation.active.is_(True))
+        .order_by(PooledMotivation.created_at.desc(), PooledMotivation.id.desc())
+        .limit(keep)
+    )
+    return PooledMotivation.query.filter(
+        PooledMotivation.mood == mood,
+        PooledMotivation.active.is_(True),
+        PooledMotivation.id.notin_(keep_ids)
+    ).update({"active": False}, synchronize_session=False)
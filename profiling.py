@@ -0,0 +1,210 @@
+import cProfile
+import io
+import marshal
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from flask import Blueprint, Response, abort, g, has_request_context, redirect, render_template, request, session, url_for
+from flask_login import current_user, login_required
+from sqlalchemy import event, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, defer
+from extensions import db
+from models import RequestProfile
+
+# Profiles kept in the database, shared by all workers
+PROFILE_LIMIT = 20
+SAMPLE_INTERVAL = 0.005
+SLOWEST_QUERIES = 10
+MODES = ("sample", "cprofile")
+
+profiling_bp = Blueprint("profiling", __name__, url_prefix="/admin/profiles")
+
+def is_admin():
+    return current_user.is_authenticated and current_user.is_admin
+
+def requested_mode():
+    """Profile this request if an admin asked for it (?_profile=... or session toggle)."""
+    mode = request.args.get("_profile") or session.get("profile_mode")
+    if mode not in MODES or request.blueprint == "profiling" or request.endpoint == "static":
+        return None
+    return mode if is_admin() else None
+
+class StackSampler:
+    """Samples one thread's Python stack into flamegraph folded-stack counts."""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+# SQL timing for the profiled request
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and "profile" in g:
+        conn.info.setdefault("profile_query_start", []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and "profile" in g:
+        starts = conn.info.get("profile_query_start")
+        if starts:
+            g.profile["queries"].append((time.perf_counter() - starts.pop(), statement))
+
+def start_profile():
+    mode = requested_mode()
+    if mode is None:
+        return
+    g.profile = {"mode": mode, "queries": [], "started": time.perf_counter()}
+    if mode == "cprofile":
+        g.profile["profiler"] = cProfile.Profile()
+        g.profile["profiler"].enable()
+    else:
+        g.profile["sampler"] = StackSampler(threading.get_ident())
+        g.profile["sampler"].start()
+
+def finish_profile(response):
+    profile = g.pop("profile", None)
+    if profile is None:
+        return response
+
+    duration = time.perf_counter() - profile["started"]
+    if profile["mode"] == "cprofile":
+        # cProfile keeps only caller/callee pairs, not stacks, so it is
+        # offered as a .prof file; flamegraphs come from sample mode
+        profiler = profile["profiler"]
+        profiler.disable()
+        buffer = io.StringIO()
+        stats = pstats.Stats(profiler, stream=buffer)
+        stats.sort_stats("cumulative").print_stats(25)
+        folded = None
+        raw = marshal.dumps(stats.stats)
+        summary = buffer.getvalue()
+    else:
+        sampler = profile["sampler"]
+        sampler.stop()
+        folded = "\n".join(f"{stack} {count}" for stack, count in sampler.stacks.items())
+        raw = None
+        summary = "\n".join(f"{count:6d}  {stack.rsplit(';', 1)[-1]}" for stack, count in sampler.stacks.most_common(25))
+
+    queries = profile["queries"]
+    record = RequestProfile(
+        mode=profile["mode"],
+        method=request.method,
+        path=request.full_path.rstrip("?")[:500],
+        status=response.status_code,
+        duration_ms=duration * 1000,
+        query_count=len(queries),
+        query_ms=sum(t for t, _ in queries) * 1000,
+        slowest_queries=sorted(([t * 1000, sql] for t, sql in queries), reverse=True)[:SLOWEST_QUERIES],
+        summary=summary,
+        folded=folded,
+        pstats=raw,
+    )
+    response.headers["X-Profile-Id"] = str(save_profile(record))
+    return response
+
+def save_profile(record):
+    """Store a profile and trim the table to the newest PROFILE_LIMIT."""
+    # Own session, so the request's session state isn't committed with it
+    with Session(db.engine) as db_session:
+        db_session.add(record)
+        db_session.flush()
+        profile_id = record.id
+        keep = select(RequestProfile.id).order_by(RequestProfile.id.desc()).limit(PROFILE_LIMIT)
+        db_session.query(RequestProfile).filter(RequestProfile.id.notin_(keep)).delete(synchronize_session=False)
+        db_session.commit()
+    return profile_id
+
+def abandon_profile(exc):
+    # Stop a profiler left running when a request dies before after_request
+    profile = g.pop("profile", None)
+    if profile is None:
+        return
+    if "sampler" in profile:
+        profile["sampler"].stop()
+    else:
+        profile["profiler"].disable()
+
+def get_profile(profile_id):
+    return db.get_or_404(RequestProfile, profile_id)
+
+# Routes
+@profiling_bp.before_request
+@login_required
+def require_admin():
+    if not current_user.is_admin:
+        abort(403)
+
+@profiling_bp.route("/")
+def index():
+    profiles = (
+        RequestProfile.query
+        .options(defer(RequestProfile.summary), defer(RequestProfile.folded), defer(RequestProfile.pstats))
+        .order_by(RequestProfile.id.desc())
+        .all()
+    )
+    return render_template("admin_profiles.html", profiles=profiles, mode=session.get("profile_mode"), modes=MODES)
+
+@profiling_bp.route("/toggle", methods=["POST"])
+def toggle():
+    mode = request.form.get("mode")
+    if mode in MODES:
+        session["profile_mode"] = mode
+    else:
+        session.pop("profile_mode", None)
+    return redirect(url_for("profiling.index"))
+
+@profiling_bp.route("/<int:profile_id>")
+def detail(profile_id):
+    return render_template("admin_profile.html", profile=get_profile(profile_id))
+
+@profiling_bp.route("/<int:profile_id>.folded")
+def download_folded(profile_id):
+    profile = get_profile(profile_id)
+    if profile.folded is None:
+        abort(404)
+    return Response(
+        profile.folded + "\n",
+        mimetype="text/plain",
+        headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.folded"'}
+    )
+
+@profiling_bp.route("/<int:profile_id>.prof")
+def download_pstats(profile_id):
+    profile = get_profile(profile_id)
+    if profile.pstats is None:
+        abort(404)
+    return Response(
+        profile.pstats,
+        mimetype="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.prof"'}
+    )
+
+def init_profiling(app):
+    app.before_request(start_profile)
+    app.after_request(finish_profile)
+    app.teardown_request(abandon_profile)
+    app.register_blueprint(profiling_bp)
@@ -0,0 +1,36 @@
+from sqlalchemy import inspect, text
+from extensions import db
+from search import ensure_search_index
+
+# Columns added to tables that already exist in deployed databases.
+# db.create_all() only creates missing tables, so these need an ALTER.
+# (table, column, Postgres type, SQLite type)
+ADDED_COLUMNS = [
+    ("motivation", "mood", "VARCHAR(20)", "VARCHAR(20)"),
+    ("motivation", "emotion_score", "DOUBLE PRECISION", "FLOAT"),
+    ("motivation", "is_harmful", "BOOLEAN DEFAULT FALSE", "BOOLEAN DEFAULT 0"),
+    ("motivation", "pool_id", "INTEGER REFERENCES motivation_pool(id)", "INTEGER REFERENCES motivation_pool(id)"),
+    ("chat_turns", "flagged", "BOOLEAN DEFAULT FALSE", "BOOLEAN DEFAULT 0"),
+]
+
+def ensure_columns():
+    """Add any missing columns from ADDED_COLUMNS (safe to re-run)."""
+    dialect = db.engine.dialect.name
+    with db.engine.begin() as conn:
+        inspector = inspect(conn)
+        for table, column, pg_type, sqlite_type in ADDED_COLUMNS:
+            if not inspector.has_table(table):
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table)}
+            if column in existing:
+                continue
+            if dialect == "postgresql":
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} {pg_type}"))
+            else:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {sqlite_type}"))
+
+def init_db():
+    """Create new tables, bring existing ones up to date and build the search index."""
+    db.create_all()
+    ensure_columns()
+    ensure_search_index()
@@ -0,0 +1,135 @@
+from markupsafe import Markup, escape
+from sqlalchemy import text, inspect, DateTime, Float, Integer, String
+from extensions import db
+
+PER_PAGE = 20
+# Highlight markers; swapped for <mark> after escaping the snippet
+HL_START, HL_STOP = "⟦", "⟧"
+
+# Only run when the column is missing: it takes an exclusive lock and the
+# first run rewrites the table
+POSTGRES_ADD_COLUMN = (
+    "ALTER TABLE motivation ADD COLUMN search_vector tsvector "
+    "GENERATED ALWAYS AS (to_tsvector('english', coalesce(content, ''))) STORED"
+)
+# Built CONCURRENTLY so reads and writes carry on during the build
+POSTGRES_INDEXES = {
+    "ix_motivation_search_vector": "CREATE INDEX CONCURRENTLY ix_motivation_search_vector ON motivation USING GIN (search_vector)",
+    "ix_motivation_user_id": "CREATE INDEX CONCURRENTLY ix_motivation_user_id ON motivation (user_id)",
+}
+
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS motivation_fts USING fts5(content, content='motivation', content_rowid='id')",
+    """CREATE TRIGGER IF NOT EXISTS motivation_fts_ai AFTER INSERT ON motivation BEGIN
+        INSERT INTO motivation_fts(rowid, content) VALUES (new.id, new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS motivation_fts_ad AFTER DELETE ON motivation BEGIN
+        INSERT INTO motivation_fts(motivation_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS motivation_fts_au AFTER UPDATE OF content ON motivation BEGIN
+        INSERT INTO motivation_fts(motivation_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        INSERT INTO motivation_fts(rowid, content) VALUES (new.id, new.content);
+    END""",
+    "CREATE INDEX IF NOT EXISTS ix_motivation_user_id ON motivation (user_id)",
+]
+
+POSTGRES_SEARCH = """
+    SELECT m.id, m.created_at, m.mood,
+           ts_headline('english', m.content, q,
+                       'StartSel=' || :hl_start || ', StopSel=' || :hl_stop || ', MaxFragments=2, MaxWords=30, MinWords=10') AS snippet,
+           ts_rank(m.search_vector, q) AS rank
+    FROM motivation m, websearch_to_tsquery('english', :q) q
+    WHERE m.user_id = :user_id AND m.search_vector @@ q
+    ORDER BY rank DESC, m.id DESC
+    LIMIT :limit OFFSET :offset
+"""
+
+SQLITE_SEARCH = """
+    SELECT m.id, m.created_at, m.mood,
+           snippet(motivation_fts, 0, :hl_start, :hl_stop, '...', 24) AS snippet,
+           bm25(motivation_fts) AS rank
+    FROM motivation_fts
+    JOIN motivation m ON m.id = motivation_fts.rowid
+    WHERE motivation_fts MATCH :q AND m.user_id = :user_id
+    ORDER BY rank, m.id DESC
+    LIMIT :limit OFFSET :offset
+"""
+
+RESULT_COLUMNS = {"id": Integer, "created_at": DateTime, "mood": String, "snippet": String, "rank": Float}
+
+def _ensure_postgres_index():
+    # Autocommit: CREATE INDEX CONCURRENTLY can't run inside a transaction
+    with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        inspector = inspect(conn)
+        columns = {c["name"] for c in inspector.get_columns("motivation")}
+        if "search_vector" not in columns:
+            conn.execute(text(POSTGRES_ADD_COLUMN))
+
+        valid = dict(conn.execute(text(
+            "SELECT c.relname, i.indisvalid FROM pg_index i "
+            "JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE i.indrelid = 'motivation'::regclass"
+        )).all())
+        for name, statement in POSTGRES_INDEXES.items():
+            if valid.get(name) is True:
+                continue
+            if name in valid:
+                # Left invalid by an interrupted concurrent build
+                conn.execute(text(f"DROP INDEX CONCURRENTLY {name}"))
+            conn.execute(text(statement))
+
+def ensure_search_index():
+    """Create the full-text index for the current database (safe to re-run).
+
+    Checks what exists first, so re-runs take no locks. Run it from
+    'flask --app wsgi init-db' or 'init-search', not from app startup.
+    """
+    dialect = db.engine.dialect.name
+    if dialect == "postgresql":
+        _ensure_postgres_index()
+    elif dialect == "sqlite":
+        with db.engine.begin() as conn:
+            exists = inspect(conn).has_table("motivation_fts")
+            for statement in SQLITE_DDL:
+                conn.execute(text(statement))
+            if not exists:
+                # Index rows saved before the triggers existed
+                conn.execute(text("INSERT INTO motivation_fts(motivation_fts) VALUES ('rebuild')"))
+    else:
+        raise RuntimeError(f"Full-text search is not supported on {dialect}")
+
+def fts5_query(q):
+    # Quote every term so user input can't break FTS5 query syntax
+    return " ".join('"' + term.replace('"', '""') + '"' for term in q.split())
+
+def highlight(snippet):
+    escaped = str(escape(snippet or ""))
+    return Markup(escaped.replace(HL_START, "<mark>").replace(HL_STOP, "</mark>"))
+
+def search_motivations(user_id, q, page=1, per_page=PER_PAGE):
+    """One page of a user's matching motivations, best match first.
+
+    Returns (results, has_next); fetches one extra row instead of counting.
+    """
+    if db.engine.dialect.name == "postgresql":
+        sql, query = POSTGRES_SEARCH, q
+    else:
+        sql, query = SQLITE_SEARCH, fts5_query(q)
+
+    rows = db.session.execute(
+        text(sql).columns(**RESULT_COLUMNS),
+        {
+            "q": query,
+            "user_id": user_id,
+            "hl_start": HL_START,
+            "hl_stop": HL_STOP,
+            "limit": per_page + 1,
+            "offset": (page - 1) * per_page,
+        }
+    ).all()
+
+    results = [
+        {"id": row.id, "created_at": row.created_at, "mood": row.mood, "snippet": highlight(row.snippet)}
+        for row in rows[:per_page]
+    ]
+    return results, len(rows) > per_page
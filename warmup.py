@@ -0,0 +1,30 @@
+import gc
+from extensions import db
+
+def warm_up(app):
+    """Build read-only state in the gunicorn master so workers inherit it."""
+    from blueprints import motivation
+
+    with app.app_context():
+        motivation.warm_up()
+
+        # Compile every template once
+        for name in app.jinja_env.list_templates():
+            if name.endswith(".html"):
+                app.jinja_env.get_template(name)
+
+        # Nothing opened here should be shared with workers
+        db.engine.dispose()
+
+    # Move everything into the permanent generation so the GC in workers
+    # doesn't touch (and copy) these pages
+    gc.collect()
+    gc.freeze()
+
+def reset_after_fork(app):
+    """Drop connections inherited from the master; each worker opens its own."""
+    from huggingface_hub.utils import reset_sessions
+
+    with app.app_context():
+        db.engine.dispose(close=False)
+    reset_sessions()